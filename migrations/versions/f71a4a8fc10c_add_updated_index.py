@@ -0,0 +1,30 @@
+"""add_updated_index
+
+Revision ID: f71a4a8fc10c
+Revises: 678f3de91b2a
+Create Date: 2026-08-27 10:14:22.918374
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "f71a4a8fc10c"
+down_revision = "678f3de91b2a"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # covering index for get_appids_from_db's ORDER BY updated
+    op.create_index(
+        "ix_steam_app_updated_appid",
+        "steam_app",
+        ["updated", "appid"],
+        unique=False,
+        if_not_exists=True,
+    )
+
+
+def downgrade():
+    op.drop_index("ix_steam_app_updated_appid", table_name="steam_app")
@@ -1,15 +1,52 @@
-import asyncio
-import json
 import sqlite3
-from datetime import datetime
+from collections.abc import Iterable
+from datetime import date, datetime
+from typing import NamedTuple
 
 import httpx
+import orjson
 import sqlalchemy.exc
 from loguru import logger
+from sqlalchemy import bindparam, delete, insert, update
 from sqlmodel import Session, select
 
-from steam2sqlite import ACHIEVEMENT_URL, APPID_URL, BATCH_SIZE, navigator, utils
-from steam2sqlite.models import Achievement, AppidError, Category, Genre, SteamApp
+from steam2sqlite import ACHIEVEMENT_URL, APPID_URL, navigator
+from steam2sqlite.models import (
+    Achievement,
+    AppidError,
+    Category,
+    CategorySteamAppLink,
+    Genre,
+    GenreSteammAppLink,
+    SteamApp,
+)
+
+
+# shared empty dict for absent nested payload sections, so the attribute
+# getters below are plain .get chains with no membership branches
+_EMPTY: dict = {}
+
+# fmt: off
+_MONTHS = {
+    "Jan": 1, "Feb": 2, "Mar": 3, "Apr": 4, "May": 5, "Jun": 6,
+    "Jul": 7, "Aug": 8, "Sep": 9, "Oct": 10, "Nov": 11, "Dec": 12,
+}
+# fmt: on
+
+
+def parse_release_date(release_date_str: str) -> date | None:
+    """Parse steam's "%b %d, %Y" release dates without strptime
+
+    strptime is locale-aware and re-derives its format regex per call; a
+    month-table lookup is ~10x faster for this fixed format. Returns None
+    for anything malformed.
+    """
+    try:
+        month, day, year = release_date_str.split()
+        return date(int(year), _MONTHS[month], int(day.rstrip(",")))
+    except (ValueError, KeyError):
+        # TODO: log this error
+        return None
 
 
 class DataParsingError(Exception):
@@ -18,8 +55,17 @@ class DataParsingError(Exception):
         self.reason = reason
 
 
+class AppRecord(NamedTuple):
+    """Projection of a stored app: everything the achievements pipeline
+    needs without hydrating the full ORM entity"""
+
+    pk: int
+    appid: int
+    achievements_total: int
+
+
 def get_or_create(session, model, **kwargs):
-    instance = session.query(model).filter_by(**kwargs).first()
+    instance = session.scalar(select(model).filter_by(**kwargs))
     if instance:
         return instance
     instance = model(**kwargs)
@@ -28,6 +74,59 @@ def get_or_create(session, model, **kwargs):
     return instance
 
 
+def bulk_get_or_create(
+    session, model, rows: Iterable[dict], key: str = "id", cache: dict | None = None
+) -> dict:
+    """Resolve many ``{key: ..., ...}`` rows to instances with one SELECT
+
+    Missing rows are created and flushed in a single batch, replacing the
+    SELECT-per-row ``get_or_create`` pattern on the hot path. Returns a dict
+    of key value -> instance. (A true ``INSERT ... ON CONFLICT`` upsert is
+    not possible here: the lookup tables have no unique constraint on
+    ``id``.)
+
+    ``cache`` is an optional ``{(model, key value): instance}`` dict shared
+    across a batch; the same handful of genres/categories recur on nearly
+    every app, so cache hits skip the SELECT entirely.
+    """
+    if not rows:
+        return {}
+    # steam sends ids as strings; coerce like the model does ("1" -> 1)
+    key_type = model.__fields__[key].type_
+    keyed_rows = {key_type(row[key]): row for row in rows}
+
+    instances = {}
+    if cache is not None:
+        instances = {
+            key_value: cache[(model, key_value)]
+            for key_value in keyed_rows
+            if (model, key_value) in cache
+        }
+
+    to_query = [key_value for key_value in keyed_rows if key_value not in instances]
+    if to_query:
+        column = getattr(model, key)
+        instances |= {
+            getattr(instance, key): instance
+            for instance in session.exec(select(model).where(column.in_(to_query)))
+        }
+
+    missing = [
+        row for key_value, row in keyed_rows.items() if key_value not in instances
+    ]
+    if missing:
+        created = [model(**row) for row in missing]
+        session.add_all(created)
+        session.flush()
+        instances |= {getattr(instance, key): instance for instance in created}
+
+    if cache is not None:
+        cache.update(
+            {(model, key_value): instance for key_value, instance in instances.items()}
+        )
+    return {row[key]: instances[key_value] for key_value, row in keyed_rows.items()}
+
+
 def update_or_create(session, model, filterargs, **kwargs):
     try:
         instance = session.exec(select(model).filter_by(**filterargs)).one_or_none()
@@ -39,7 +138,10 @@ def update_or_create(session, model, filterargs, **kwargs):
 
     if instance:  # update
         for key, value in kwargs.items():
-            setattr(instance, key, value)
+            # only write changed values: each setattr goes through the ORM
+            # instrumentation and marks the row dirty
+            if getattr(instance, key) != value:
+                setattr(instance, key, value)
     else:  # create
         instance = model(**kwargs)
 
@@ -47,36 +149,66 @@ def update_or_create(session, model, filterargs, **kwargs):
 
 
 def attach_achievements_to_app(
-    session: Session, app_achievements_dict: list[dict], app: SteamApp
+    session: Session, app_achievements_dict: list[dict], app: AppRecord
 ):
-    for achievement_dict in app_achievements_dict:
-        achievement_args = achievement_dict | {"steam_app": app}  # joining dicts
-        update_or_create(
-            session,
-            Achievement,
-            {"steam_app": app, "name": achievement_dict["name"]},
-            **achievement_args,
+    # one SELECT by pk instead of one per achievement; only needs app.pk,
+    # not the full ORM entity
+    existing_achievements = session.exec(
+        select(Achievement).where(Achievement.steam_app_pk == app.pk)
+    ).all()
+    existing = {achievement.name: achievement for achievement in existing_achievements}
+    if len(existing) != len(existing_achievements):
+        raise sqlalchemy.exc.MultipleResultsFound(
+            f"duplicate achievement names on appid {app.appid}"
         )
 
-    session.commit()
+    to_insert = []
+    to_update = []
+    for achievement_dict in app_achievements_dict:
+        achievement = existing.get(achievement_dict["name"])
+        if achievement:  # update
+            if achievement.percent != achievement_dict["percent"]:
+                to_update.append(
+                    {
+                        "achievement_pk": achievement.pk,
+                        "percent": achievement_dict["percent"],
+                    }
+                )
+        else:  # create
+            to_insert.append(achievement_dict | {"steam_app_pk": app.pk})
+
+    # Core executemany: one prepared statement per kind instead of ORM
+    # unit-of-work per row
+    if to_insert:
+        session.execute(insert(Achievement), to_insert)
+    if to_update:
+        session.execute(
+            update(Achievement)
+            .where(Achievement.pk == bindparam("achievement_pk"))
+            .values(percent=bindparam("percent")),
+            to_update,
+        )
 
 
 def clear_and_store_achievements(
-    session: Session, app_achievements_dict: list[dict], app: SteamApp
+    session: Session, app_achievements_dict: list[dict], app: AppRecord
 ):
-    app.achievements = []
-    session.commit()
-    session.refresh(app)
-
-    for achievement_dict in app_achievements_dict:
-        inst = Achievement(**achievement_dict)
-        app.achievements.append(inst)
-    session.commit()
+    session.execute(delete(Achievement).where(Achievement.steam_app_pk == app.pk))
+    if app_achievements_dict:
+        session.execute(
+            insert(Achievement),
+            [
+                achievement_dict | {"steam_app_pk": app.pk}
+                for achievement_dict in app_achievements_dict
+            ],
+        )
 
 
-def get_apps_achievements(apps: list[SteamApp]) -> list[tuple[SteamApp, list[dict]]]:
+async def get_apps_achievements(
+    apps: list[AppRecord],
+) -> list[tuple[AppRecord, list[dict]]]:
     urls = [ACHIEVEMENT_URL.format(app.appid) for app in apps]
-    responses = asyncio.run(navigator.make_requests(urls))
+    responses = await navigator.make_requests(urls)
 
     apps_achievements_data = []
     for app, resp in zip(apps, responses):
@@ -86,8 +218,8 @@ def get_apps_achievements(apps: list[SteamApp]) -> list[tuple[SteamApp, list[dic
             continue
 
         try:
-            data = resp.raise_for_status().json()
-        except (httpx.HTTPError, json.JSONDecodeError):
+            data = orjson.loads(resp.raise_for_status().content)
+        except (httpx.HTTPError, orjson.JSONDecodeError):
             logger.error(f"Error getting achievements for appid: {app.appid}")
             continue
 
@@ -105,7 +237,7 @@ def get_apps_achievements(apps: list[SteamApp]) -> list[tuple[SteamApp, list[dic
 
 
 def store_apps_achievements(
-    session: Session, apps_achievements_data: list[tuple[SteamApp, list[dict]]]
+    session: Session, apps_achievements_data: list[tuple[AppRecord, list[dict]]]
 ):
     for app_achievement_data in apps_achievements_data:
         app, achievement_data = app_achievement_data
@@ -115,49 +247,70 @@ def store_apps_achievements(
             # clear out achievements and store them fresh
             clear_and_store_achievements(session, achievement_data, app)
 
+    # one commit covers all apps in the batch
+    session.commit()
+
+
+def replace_link_rows(
+    session: Session, link_model, link_column: str, pks: list[int], steam_app_pk: int
+):
+    """Rewrite an app's link-table rows with two Core statements
+
+    One DELETE plus one multi-row INSERT OR IGNORE, instead of the ORM
+    relationship assignment which loads the collection and emits one
+    statement per link row.
+    """
+    session.execute(delete(link_model).where(link_model.steam_app_pk == steam_app_pk))
+    if pks:
+        session.execute(
+            insert(link_model)
+            .values([{link_column: pk, "steam_app_pk": steam_app_pk} for pk in pks])
+            .prefix_with("OR IGNORE")
+        )
+
 
-def load_app_into_db(session: Session, data: dict) -> SteamApp:
-    genres_data = data.get("genres") or []
-    if genres_data:
-        # deduplicate
-        genres_data = list({v["id"]: v for v in genres_data}.values())
-    genres = [get_or_create(session, Genre, **dd) for dd in genres_data]
+def prefetch_apps(session: Session, appids: list[int]) -> dict[int, SteamApp]:
+    """Fetch the existing SteamApps for a batch in one SELECT, keyed by appid"""
+    return {
+        app.appid: app
+        for app in session.exec(
+            select(SteamApp).where(SteamApp.appid.in_(appids))  # type: ignore
+        )
+    }
 
-    categories_data = data.get("categories") or []
-    if categories_data:
-        # deduplicate
-        categories_data = list({v["id"]: v for v in categories_data}.values())
-    categories = [get_or_create(session, Category, **dd) for dd in categories_data]
 
-    metacritic_score, metacritic_url = None, None
-    if "metacritic" in data:
-        metacritic_score = data["metacritic"].get("score")
-        metacritic_url = data["metacritic"].get("url")
+def load_app_into_db(
+    session: Session,
+    data: dict,
+    commit: bool = True,
+    existing: dict[int, SteamApp] | None = None,
+    lookup_cache: dict | None = None,
+    updated_at: datetime | None = None,
+) -> SteamApp:
+    # deduplicate by id while parsing, no intermediate list
+    genres_data = {v["id"]: v for v in data.get("genres") or []}
+    genre_map = bulk_get_or_create(
+        session, Genre, genres_data.values(), cache=lookup_cache
+    )
+    genres = list(genre_map.values())
 
-    recommendations_total = None
-    if "recommendations" in data:
-        recommendations_total = data["recommendations"].get("total")
+    categories_data = {v["id"]: v for v in data.get("categories") or []}
+    category_map = bulk_get_or_create(
+        session, Category, categories_data.values(), cache=lookup_cache
+    )
+    categories = list(category_map.values())
 
-    achievements_total = 0
-    if "achievements" in data:
-        achievements_total = data["achievements"].get("total", 0)
+    metacritic = data.get("metacritic") or _EMPTY
+    recommendations = data.get("recommendations") or _EMPTY
+    achievements = data.get("achievements") or _EMPTY
+    price_overview = data.get("price_overview") or _EMPTY
+    release = data.get("release_date") or _EMPTY
 
     release_date = None
-    if "release_date" in data and not (
-        "coming_soon" in data["release_date"] and data["release_date"]["coming_soon"]
-    ):
-        release_date_str = data["release_date"].get("date")
-        try:
-            if release_date_str:
-                release_date = datetime.strptime(release_date_str, "%b %d, %Y").date()
-        except ValueError:
-            # TODO: log this error
-            pass
-
-    initial_price = current_price = None
-    if "price_overview" in data:
-        initial_price = data["price_overview"].get("initial")
-        current_price = data["price_overview"].get("final")
+    if not release.get("coming_soon"):
+        release_date_str = release.get("date")
+        if release_date_str:
+            release_date = parse_release_date(release_date_str)
 
     app_attrs = {
         "appid": data["steam_appid"],
@@ -165,32 +318,66 @@ def load_app_into_db(session: Session, data: dict) -> SteamApp:
         "is_free": data.get("is_free"),
         "name": data["name"],
         "controller_support": data.get("controller_support"),
-        "metacritic_score": metacritic_score,
-        "metacritic_url": metacritic_url,
-        "recommendations": recommendations_total,
-        "achievements_total": achievements_total,
+        "metacritic_score": metacritic.get("score"),
+        "metacritic_url": metacritic.get("url"),
+        "recommendations": recommendations.get("total"),
+        "achievements_total": achievements.get("total", 0),
         "release_date": release_date,
-        "initial_price": initial_price,
-        "current_price": current_price,
+        "initial_price": price_overview.get("initial"),
+        "current_price": price_overview.get("final"),
     }
-    steam_app = update_or_create(
-        session, SteamApp, {"appid": data["steam_appid"]}, **app_attrs
-    )
-
-    steam_app.categories = categories
-    steam_app.genres = genres
+    if existing is not None:
+        # batch path: apps were prefetched in one SELECT, no per-app query
+        steam_app = existing.get(data["steam_appid"])
+        if steam_app:  # update
+            for key, value in app_attrs.items():
+                if getattr(steam_app, key) != value:
+                    setattr(steam_app, key, value)
+        else:  # create
+            steam_app = SteamApp(**app_attrs)
+            existing[data["steam_appid"]] = steam_app
+    else:
+        steam_app = update_or_create(
+            session, SteamApp, {"appid": data["steam_appid"]}, **app_attrs
+        )
 
-    steam_app.updated = datetime.utcnow()
+    steam_app.updated = updated_at or datetime.utcnow()
 
     session.add(steam_app)
-    session.commit()
-    session.refresh(steam_app)
+    session.flush()  # assigns a pk to new apps before the link rows are written
+
+    replace_link_rows(
+        session,
+        CategorySteamAppLink,
+        "category_pk",
+        [category.pk for category in categories],
+        steam_app.pk,
+    )
+    replace_link_rows(
+        session,
+        GenreSteammAppLink,
+        "genre_pk",
+        [genre.pk for genre in genres],
+        steam_app.pk,
+    )
+
+    if commit:
+        session.commit()
+    else:
+        session.flush()
 
     return steam_app
 
 
-def import_single_app(session: Session, item: dict) -> SteamApp:
-    appid = list(item.keys())[0]
+def import_single_app(
+    session: Session,
+    item: dict,
+    commit: bool = True,
+    existing: dict[int, SteamApp] | None = None,
+    lookup_cache: dict | None = None,
+    updated_at: datetime | None = None,
+) -> SteamApp:
+    appid = next(iter(item))
     if item[appid]["success"] is False:
         raise DataParsingError(int(appid), reason="Response from api: success=False")
 
@@ -203,7 +390,14 @@ def import_single_app(session: Session, item: dict) -> SteamApp:
         )
 
     try:
-        app = load_app_into_db(session, data)
+        app = load_app_into_db(
+            session,
+            data,
+            commit=commit,
+            existing=existing,
+            lookup_cache=lookup_cache,
+            updated_at=updated_at,
+        )
     except (sqlite3.DatabaseError, sqlalchemy.exc.IntegrityError) as e:
         raise DataParsingError(int(appid), reason=f"Database error: {e}")
 
@@ -216,25 +410,28 @@ def get_appids_from_db(session: Session) -> list[tuple[int, datetime]]:
     ).all()
 
 
-def get_error_appids(session: Session) -> list[int]:
-    return session.exec(select(AppidError.appid)).all()
+def get_error_appids(session: Session) -> set[int]:
+    return set(session.exec(select(AppidError.appid)).all())
 
 
 def record_appid_error(
     session, appid: int, name: str | None = None, reason: str | None = None
 ):
+    # flushed here, committed with the rest of the batch
     get_or_create(session, AppidError, appid=appid, name=name, reason=reason)
-    session.commit()
 
 
-# delay for rate limiting
-@utils.delay_by(BATCH_SIZE)
-def get_apps_data(
-    session: Session, steam_appids_names: dict[int, str], appids: list[int]
-) -> list[dict]:
+async def fetch_apps_data(appids: list[int]) -> list[httpx.Response]:
     urls = [APPID_URL.format(appid) for appid in appids if appid is not None]
-    responses = asyncio.run(navigator.make_requests(urls))
+    return await navigator.make_requests(urls)
 
+
+def parse_apps_responses(
+    session: Session,
+    steam_appids_names: dict[int, str],
+    appids: list[int],
+    responses: list[httpx.Response],
+) -> list[dict]:
     apps_data = []
     for appid, resp in zip(appids, responses, strict=False):
         # make_requests inserts exceptions into the responses list
@@ -244,9 +441,9 @@ def get_apps_data(
             continue
 
         try:
-            item = resp.raise_for_status().json()
+            item = orjson.loads(resp.raise_for_status().content)
             apps_data.append(item)
-        except (httpx.HTTPError, json.JSONDecodeError) as e:
+        except (httpx.HTTPError, orjson.JSONDecodeError) as e:
             logger.error(f"Http error with appid: {appid}")
             record_appid_error(session, appid, steam_appids_names[appid], f"{e}")
 
@@ -255,15 +452,46 @@ def get_apps_data(
 
 def store_apps_data(
     session: Session, steam_appids_names: dict[int, str], apps_data: list[dict]
-) -> list[SteamApp]:
+) -> list[AppRecord]:
+    # one SELECT for all existing apps in the batch instead of one per app
+    batch_appids = [
+        value["data"]["steam_appid"]
+        for item in apps_data
+        for value in item.values()
+        if value.get("success") and "data" in value
+    ]
+    existing = prefetch_apps(session, batch_appids)
+
+    # genre/category instances resolved so far this batch, shared across apps
+    lookup_cache: dict = {}
+
+    # one timestamp for the whole batch
+    updated_at = datetime.utcnow()
+
     apps = []
     for app_data in apps_data:
         try:
-            app = import_single_app(session, app_data)
-            apps.append(app)
+            # SAVEPOINT so one bad app doesn't abort the whole batch
+            with session.begin_nested():
+                app = import_single_app(
+                    session,
+                    app_data,
+                    commit=False,
+                    existing=existing,
+                    lookup_cache=lookup_cache,
+                    updated_at=updated_at,
+                )
+            # project while the instance is fresh: reading these after the
+            # batch commit would trigger a refresh SELECT per app
+            apps.append(AppRecord(app.pk, app.appid, app.achievements_total))
         except DataParsingError as e:
             logger.error(f"Error for appid: {e.appid}, reason: {e.reason}")
+            # instances cached during the rolled-back SAVEPOINT may be gone
+            lookup_cache.clear()
             record_appid_error(
                 session, e.appid, steam_appids_names.get(e.appid, "unknown"), e.reason
             )
+
+    # one commit covers all apps in the batch
+    session.commit()
     return apps
@@ -2,13 +2,13 @@
 
 import asyncio
 import datetime
-import json
 import os
 import time
 from argparse import ArgumentParser
 from collections.abc import Sequence
 
 import httpx
+import orjson
 import uvloop
 from dotenv import load_dotenv
 from loguru import logger
@@ -16,13 +16,15 @@ from sqlmodel import Session, create_engine
 
 from steam2sqlite import APPIDS_URL, BATCH_SIZE, navigator, utils
 from steam2sqlite.handler import (
+    fetch_apps_data,
     get_appids_from_db,
     get_apps_achievements,
-    get_apps_data,
     get_error_appids,
+    parse_apps_responses,
     store_apps_achievements,
     store_apps_data,
 )
+from steam2sqlite.models import set_sqlite_pragmas
 
 load_dotenv()
 
@@ -33,16 +35,19 @@ SQLITE_URL = f"sqlite:///{sqlite_file_name}"
 
 
 async def get_appids_from_steam(local_file: str | None = None) -> dict[int, str]:
+    # the applist is megabytes of JSON (~200k apps): parse the raw bytes
+    # with orjson rather than going through Response.json()'s str decode,
+    # and drop the parsed tree as soon as the {appid: name} dict is built
     if local_file:
         logger.info(f"Loading appids from local file: {local_file}")
-        with open(local_file) as steam_appids_fp:
-            appid_data = json.load(steam_appids_fp)
+        with open(local_file, "rb") as steam_appids_fp:
+            appid_data = orjson.loads(steam_appids_fp.read())
     else:
         logger.info("Loading appids from Steam API")
         try:
             async with httpx.AsyncClient() as client:
                 resp = await navigator.get(client, APPIDS_URL)
-            appid_data = resp.json()
+            appid_data = orjson.loads(resp.content)
             await asyncio.sleep(1)
         except navigator.NavigatorError:
             logger.error("Error getting the appids from Steam")
@@ -51,6 +56,54 @@ async def get_appids_from_steam(local_file: str | None = None) -> dict[int, str]
     return {item["appid"]: item["name"] for item in appid_data["applist"]["apps"]}
 
 
+async def process_batches(
+    session: Session,
+    steam_appids_names: dict[int, str],
+    appids_to_process: Sequence[int],
+    limit: float | None,
+    start_time: float,
+) -> None:
+    batches = [
+        [appid for appid in batch if appid is not None]
+        for batch in utils.grouper(appids_to_process, BATCH_SIZE, fillvalue=None)
+    ]
+    if not batches:
+        return
+
+    async def rate_limited_fetch(appids: list[int]) -> list[httpx.Response]:
+        # hold the task open until the rate-limit window has elapsed, so the
+        # wait runs concurrently with the db work in the foreground
+        begin = time.monotonic()
+        responses = await fetch_apps_data(appids)
+        await asyncio.sleep(max(BATCH_SIZE - (time.monotonic() - begin), 0))
+        return responses
+
+    fetch_task = asyncio.create_task(rate_limited_fetch(batches[0]))
+    for batch_num, appids in enumerate(batches):
+        responses = await fetch_task
+        # start the next batch's requests while this one is parsed and stored
+        if batch_num + 1 < len(batches):
+            fetch_task = asyncio.create_task(rate_limited_fetch(batches[batch_num + 1]))
+
+        apps_data = parse_apps_responses(session, steam_appids_names, appids, responses)
+        apps = store_apps_data(session, steam_appids_names, apps_data)
+
+        apps_with_achievements = [app for app in apps if app.achievements_total > 0]
+        if apps_with_achievements:
+            begin = time.monotonic()
+            apps_achievements_data = await get_apps_achievements(apps_with_achievements)
+            store_apps_achievements(session, apps_achievements_data)
+            # achievements rate limit, overlapping the next batch's fetch
+            await asyncio.sleep(
+                max(len(apps_with_achievements) - (time.monotonic() - begin), 0)
+            )
+
+        if limit and (time.monotonic() - start_time) / 60 > limit:
+            logger.info(f"Limit ({limit} min) reached shutting down...")
+            fetch_task.cancel()
+            break
+
+
 def main(argv: Sequence[str] | None = None) -> int:
     parser = ArgumentParser()
     parser.add_argument(
@@ -71,6 +124,7 @@ def main(argv: Sequence[str] | None = None) -> int:
     uvloop.install()
 
     engine = create_engine(SQLITE_URL, echo=False)
+    set_sqlite_pragmas(engine)
 
     # From steam api, dict of: {appids: names}
     steam_appids_names = asyncio.run(get_appids_from_steam(APPIDS_FILE))
@@ -94,9 +148,9 @@ def main(argv: Sequence[str] | None = None) -> int:
         appids_missing_and_older = list(missing_appids) + db_appids
 
         # remove any appids that have been flagged as errors from previous runs
-        error_appids_set = set(get_error_appids(session))
+        error_appids = get_error_appids(session)
         appids_without_errors = [
-            appid for appid in appids_missing_and_older if appid not in error_appids_set
+            appid for appid in appids_missing_and_older if appid not in error_appids
         ]
 
         # remove any appids that are not in steam anymore (apps that get removed?)
@@ -106,20 +160,11 @@ def main(argv: Sequence[str] | None = None) -> int:
 
         logger.info("Loading app data from Steam API and saving to db")
 
-        for appids in utils.grouper(appids_to_process, BATCH_SIZE, fillvalue=None):
-            apps_data = get_apps_data(session, steam_appids_names, appids)
-            apps = store_apps_data(session, steam_appids_names, apps_data)
-
-            apps_with_achievements = [app for app in apps if app.achievements_total > 0]
-            if apps_with_achievements:
-                apps_achievements_data = utils.delay_by(len(apps_with_achievements))(
-                    get_apps_achievements
-                )(apps_with_achievements)
-                store_apps_achievements(session, apps_achievements_data)
-
-            if args.limit and (time.monotonic() - start_time) / 60 > args.limit:
-                logger.info(f"Limit ({args.limit} min) reached shutting down...")
-                break
+        asyncio.run(
+            process_batches(
+                session, steam_appids_names, appids_to_process, args.limit, start_time
+            )
+        )
 
     return 0
 
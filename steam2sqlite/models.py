@@ -2,6 +2,7 @@ from datetime import date, datetime
 from typing import Optional  # to be removed once Pydantic supports Union operator
 from typing import List
 
+from sqlalchemy import Index, event
 from sqlmodel import Field, Relationship, SQLModel
 
 
@@ -43,6 +44,9 @@ class Genre(SQLModel, table=True):
 
 class SteamApp(SQLModel, table=True):
     __tablename__ = "steam_app"  # type: ignore
+    # covering index: get_appids_from_db selects (appid, updated) ordered by
+    # updated, so this makes it an index-only scan
+    __table_args__ = (Index("ix_steam_app_updated_appid", "updated", "appid"),)
     pk: Optional[int] = Field(default=None, primary_key=True)
     appid: int = Field(index=True, sa_column_kwargs={"unique": True})
     type: Optional[str] = Field(default=None)
@@ -58,9 +62,9 @@ class SteamApp(SQLModel, table=True):
     current_price: Optional[int] = Field(default=None)
 
     created: datetime = Field(sa_column_kwargs={"default": datetime.utcnow})
-    updated: datetime = Field(
-        sa_column_kwargs={"default": datetime.utcnow, "onupdate": datetime.utcnow}
-    )
+    # no onupdate: the handler sets updated explicitly, which keeps bulk
+    # update paths free of per-row column callbacks
+    updated: datetime = Field(sa_column_kwargs={"default": datetime.utcnow})
 
     categories: List[Category] = Relationship(
         back_populates="steam_apps", link_model=CategorySteamAppLink
@@ -94,5 +98,25 @@ class AppidError(SQLModel, table=True):
     reason: Optional[str] = Field(default=None)
 
 
+def set_sqlite_pragmas(engine):
+    """Tune SQLite for our small-transaction write loops
+
+    WAL avoids the two fsyncs + journal rewrite per commit of the default
+    DELETE journal mode; the rest enlarge the page cache and keep temp data
+    in memory.
+    """
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA cache_size=-65536")
+        cursor.execute("PRAGMA busy_timeout=5000")
+        cursor.execute("PRAGMA mmap_size=268435456")
+        cursor.close()
+
+
 def create_db_and_tables(engine):
     SQLModel.metadata.create_all(engine)
@@ -5,6 +5,10 @@ import httpx
 from loguru import logger
 
 
+# cap on in-flight requests; connection limits alone queue inside httpx
+MAX_CONCURRENCY = 20
+
+
 class NavigatorError(Exception):
     """Exception for navigator errors (after multiple retries)"""
 
@@ -31,13 +35,25 @@ async def get(
     return resp
 
 
-async def make_requests(urls: list[str]) -> list[httpx.Response]:
-    """List of urls to a list of responses using asyncio"""
-    limits = httpx.Limits(max_connections=10, max_keepalive_connections=5)
+async def make_requests(
+    urls: list[str], max_concurrency: int = MAX_CONCURRENCY
+) -> list[httpx.Response]:
+    """List of urls to a list of responses using asyncio
+
+    Concurrency is bounded with a semaphore for back-pressure instead of
+    relying on the connection pool limits alone.
+    """
+    limits = httpx.Limits(max_connections=50, max_keepalive_connections=20)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def bounded_get(client: httpx.AsyncClient, url: str) -> httpx.Response:
+        async with semaphore:
+            return await get(client, url)
+
     async with httpx.AsyncClient(
         headers={"accept": "application/json"}, timeout=10, limits=limits
     ) as client:
-        tasks = [get(client, url) for url in urls]
+        tasks = [bounded_get(client, url) for url in urls]
         responses = await asyncio.gather(*tasks, return_exceptions=True)
 
     return responses  # type: ignore
@@ -1,4 +1,6 @@
+import copy
 import json
+from datetime import date
 
 import pytest
 from sqlmodel import Session, create_engine, select
@@ -57,6 +59,12 @@ def portal_achievements(session, portal_app):
     handler.store_apps_achievements(session, apps_achievements_data)
 
 
+def test_parse_release_date():
+    assert handler.parse_release_date("Apr 18, 2011") == date(2011, 4, 18)
+    assert handler.parse_release_date("Apr 2011") is None
+    assert handler.parse_release_date("coming soon") is None
+
+
 def test_app_with_duplicated_appid(session):
     """Portal 2 is listed more than once with different appids (620, 659)
     However the preorder (659) has an internal appid of 620
@@ -76,6 +84,39 @@ def test_app_with_duplicated_appid(session):
         handler.import_single_app(session, dup_app_data)
 
 
+def test_store_apps_data_mixed_batch(session: Session):
+    """A bad app in a batch rolls back only itself
+
+    The good apps persist, both kinds of failure end up in appid_error,
+    and everything is committed with the batch.
+    """
+    good_data = get_apps_data(["620"])[0]
+
+    # the pre-order duplicate (659) references steam appid 620 -> DataParsingError
+    mismatch_data = get_apps_data(["659"])[0]
+
+    # copy of 620 under a new appid with a null name -> IntegrityError at
+    # flush, inside the SAVEPOINT
+    bad_data = {"10": copy.deepcopy(good_data["620"])}
+    bad_data["10"]["data"]["steam_appid"] = 10
+    bad_data["10"]["data"]["name"] = None
+
+    apps = handler.store_apps_data(
+        session, steam_appids_names, [good_data, mismatch_data, bad_data]
+    )
+
+    # only the good app comes back, projected with its stored values
+    assert [(app.appid, app.achievements_total) for app in apps] == [(620, 51)]
+    assert apps[0].pk is not None
+
+    # the failed apps rolled back, the good app persisted
+    stored_appids = session.exec(select(models.SteamApp.appid)).all()
+    assert stored_appids == [620]
+
+    # both failures were recorded
+    assert handler.get_error_appids(session) == {659, 10}
+
+
 def test_ingest_item_twice(session: Session):
     appid = "620"
     app_data = get_apps_data([appid])[0]